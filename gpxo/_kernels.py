@@ -0,0 +1,227 @@
+"""Compiled kernels (numba) for gpx data processing, if numba is installed.
+
+If numba is not available, kernels are set to None and callers fall back
+on pure numpy / python implementations (except cum_vincenty, which falls
+back on a vectorized numpy version).
+"""
+
+from functools import lru_cache
+import math
+
+import numpy as np
+
+from .general import EARTH_RADIUS, _cumulative_sum
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+
+# WGS84 ellipsoid
+_A = 6378137.0             # semi-major axis (m)
+_F = 1 / 298.257223563     # flattening
+_B = (1 - _F) * _A         # semi-minor axis (m)
+
+_MAX_ITERATIONS = 200
+_CONVERGENCE_THRESHOLD = 1e-12
+
+
+def _vincenty_inverse(lat1, long1, lat2, long2):
+    """Vincenty distance (km) between two points (lat, long in °), WGS84."""
+    if lat1 == lat2 and long1 == long2:
+        return 0.0
+
+    U1 = math.atan((1 - _F) * math.tan(math.radians(lat1)))
+    U2 = math.atan((1 - _F) * math.tan(math.radians(lat2)))
+    L = math.radians(long2 - long1)
+    lam = L
+
+    sin_U1, cos_U1 = math.sin(U1), math.cos(U1)
+    sin_U2, cos_U2 = math.sin(U2), math.cos(U2)
+
+    sin_sigma = cos_sigma = sigma = cos_sq_alpha = cos2_sigma_m = 0.0
+
+    for _ in range(_MAX_ITERATIONS):
+        sin_lam, cos_lam = math.sin(lam), math.cos(lam)
+        sin_sigma = math.sqrt((cos_U2 * sin_lam) ** 2 +
+                              (cos_U1 * sin_U2 - sin_U1 * cos_U2 * cos_lam) ** 2)
+        if sin_sigma == 0:
+            return 0.0  # coincident points
+        cos_sigma = sin_U1 * sin_U2 + cos_U1 * cos_U2 * cos_lam
+        sigma = math.atan2(sin_sigma, cos_sigma)
+        sin_alpha = cos_U1 * cos_U2 * sin_lam / sin_sigma
+        cos_sq_alpha = 1 - sin_alpha ** 2
+        if cos_sq_alpha != 0:
+            cos2_sigma_m = cos_sigma - 2 * sin_U1 * sin_U2 / cos_sq_alpha
+        else:
+            cos2_sigma_m = 0.0  # equatorial line
+        C = _F / 16 * cos_sq_alpha * (4 + _F * (4 - 3 * cos_sq_alpha))
+        lam_prev = lam
+        lam = L + (1 - C) * _F * sin_alpha * (
+            sigma + C * sin_sigma * (
+                cos2_sigma_m + C * cos_sigma * (-1 + 2 * cos2_sigma_m ** 2)))
+        if abs(lam - lam_prev) < _CONVERGENCE_THRESHOLD:
+            break
+
+    u_sq = cos_sq_alpha * (_A ** 2 - _B ** 2) / (_B ** 2)
+    A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = B * sin_sigma * (
+        cos2_sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos2_sigma_m ** 2) -
+            B / 6 * cos2_sigma_m * (-3 + 4 * sin_sigma ** 2) *
+            (-3 + 4 * cos2_sigma_m ** 2)))
+
+    return _B * A * (sigma - delta_sigma) / 1000
+
+
+def _cum_vincenty(lat, long):
+    """Cumulative Vincenty distance (km) along trajectory (lat, long in °)."""
+    n = lat.size
+    ds = np.zeros(n)
+    # segments are independent (parallel), then serial prefix sum
+    for i in prange(1, n):
+        ds[i] = _vincenty_inverse(lat[i - 1], long[i - 1], lat[i], long[i])
+    return np.cumsum(ds)
+
+
+def _cum_vincenty_numpy(lat, long):
+    """Same as _cum_vincenty(), vectorized with numpy (no numba needed).
+
+    All segments are iterated simultaneously until all have converged.
+    """
+    U1 = np.arctan((1 - _F) * np.tan(np.radians(lat[:-1])))
+    U2 = np.arctan((1 - _F) * np.tan(np.radians(lat[1:])))
+    L = np.radians(np.diff(long))
+    lam = L
+
+    sin_U1, cos_U1 = np.sin(U1), np.cos(U1)
+    sin_U2, cos_U2 = np.sin(U2), np.cos(U2)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        for _ in range(_MAX_ITERATIONS):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.sqrt((cos_U2 * sin_lam) ** 2 +
+                                (cos_U1 * sin_U2 - sin_U1 * cos_U2 * cos_lam) ** 2)
+            coincident = (sin_sigma == 0)
+            cos_sigma = sin_U1 * sin_U2 + cos_U1 * cos_U2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(coincident, 0, cos_U1 * cos_U2 * sin_lam / sin_sigma)
+            cos_sq_alpha = 1 - sin_alpha ** 2
+            cos2_sigma_m = np.where(cos_sq_alpha != 0,  # 0 on equatorial line
+                                    cos_sigma - 2 * sin_U1 * sin_U2 / cos_sq_alpha,
+                                    0)
+            C = _F / 16 * cos_sq_alpha * (4 + _F * (4 - 3 * cos_sq_alpha))
+            lam_prev = lam
+            lam = L + (1 - C) * _F * sin_alpha * (
+                sigma + C * sin_sigma * (
+                    cos2_sigma_m + C * cos_sigma * (-1 + 2 * cos2_sigma_m ** 2)))
+            if np.all(np.abs(lam - lam_prev) < _CONVERGENCE_THRESHOLD):
+                break
+
+    u_sq = cos_sq_alpha * (_A ** 2 - _B ** 2) / (_B ** 2)
+    A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = B * sin_sigma * (
+        cos2_sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos2_sigma_m ** 2) -
+            B / 6 * cos2_sigma_m * (-3 + 4 * sin_sigma ** 2) *
+            (-3 + 4 * cos2_sigma_m ** 2)))
+
+    ds = np.where(coincident, 0, _B * A * (sigma - delta_sigma) / 1000)
+
+    return _cumulative_sum(ds)
+
+
+def _cum_haversine(lat, long):
+    """Cumulative haversine distance (km) along trajectory (lat, long in °)."""
+    n = lat.size
+    ds = np.zeros(n)
+    # segments are independent (parallel), then serial prefix sum
+    for i in prange(1, n):
+        lat1 = math.radians(lat[i - 1])
+        lat2 = math.radians(lat[i])
+        d_long = math.radians(long[i] - long[i - 1])
+        a = (math.sin((lat2 - lat1) / 2) ** 2 +
+             math.cos(lat1) * math.cos(lat2) * math.sin(d_long / 2) ** 2)
+        ds[i] = 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+    return np.cumsum(ds)
+
+
+def _compass(lat1, long1, lat2, long2, out):
+    """Compass bearing (°) between arrays of points, written into out.
+
+    Fused version of gpxo.compass(): inputs are read and output written
+    once, without intermediate arrays.
+    """
+    for i in prange(out.size):
+        la1 = math.radians(lat1[i])
+        la2 = math.radians(lat2[i])
+        d_long = math.radians(long2[i] - long1[i])
+        x = math.sin(d_long) * math.cos(la2)
+        y = math.cos(la1) * math.sin(la2) - math.sin(la1) * math.cos(la2) * math.cos(d_long)
+        # same normalization as gpxo.general._normalize_bearing()
+        bearing = math.degrees(math.atan2(x, y))
+        bearing += 360.0 * (bearing < 0)
+        out[i] = bearing * (bearing < 360.0)
+
+
+def _compass_xy(lat, long, x, y):
+    """x, y components of compass bearing between successive points (lat, long
+    in °), written into x and y; used by Track.compass (which resamples them).
+
+    sin / cos of each angle are computed in a single pass, without
+    intermediate arrays.
+    """
+    for i in prange(x.size):
+        lat1 = math.radians(lat[i])
+        lat2 = math.radians(lat[i + 1])
+        d_long = math.radians(long[i + 1] - long[i])
+        cos_lat2 = math.cos(lat2)
+        x[i] = math.sin(d_long) * cos_lat2
+        y[i] = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * cos_lat2 * math.cos(d_long)
+
+
+if njit is not None:
+    _vincenty_inverse = njit(cache=True, fastmath=True)(_vincenty_inverse)
+    cum_vincenty = njit(cache=True, fastmath=True, parallel=True)(_cum_vincenty)
+    cum_haversine = njit(cache=True, fastmath=True, parallel=True)(_cum_haversine)
+    compass_kernel = njit(cache=True, parallel=True)(_compass)
+    compass_xy = njit(cache=True, parallel=True)(_compass_xy)
+else:
+    cum_vincenty = _cum_vincenty_numpy
+    cum_haversine = None
+    compass_kernel = None
+    compass_xy = None
+
+
+@lru_cache(maxsize=None)
+def smoothing_kernel(window_weights):
+    """Compiled valid-mode convolution, specialized for given window weights.
+
+    window_weights is a tuple (hashable, for caching) of normalized weights;
+    the window size being a compile-time constant, numba can unroll and
+    vectorize the inner loop. Compilation takes a fraction of a second for
+    each new window, so this is only useful for repeated calls.
+    Returns None if numba is not installed.
+    """
+    if njit is None:
+        return None
+
+    w = np.array(window_weights)
+    n = w.size
+
+    @njit(fastmath=True)
+    def convolve(x):
+        out = np.empty(x.size - n + 1)
+        for i in range(out.size):
+            s = 0.0
+            for j in range(n):
+                s += w[j] * x[i + j]
+            out[i] = s
+        return out
+
+    return convolve
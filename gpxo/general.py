@@ -1,11 +1,73 @@
 """General tools for gpx data processing based on gpxpy."""
 
 
+import math
+
 import numpy as np
-from vincenty import vincenty
 
+try:
+    from uvincenty import vincenty as _vincenty_c
+except ImportError:
+    from vincenty import vincenty as _vincenty_py
+    _vincenty_c = None
+
+
+# Mean Earth radius (km), IUGG value
+EARTH_RADIUS = 6371.0088
+
+# Number of points above which Track uses compiled kernels (if numba installed)
+# when a vectorized numpy version exists; below, numba import and parallel
+# overheads outweigh the gain.
+COMPILED_THRESHOLD = 100_000
+
+# Window size above which smoothing uses FFT convolution (if scipy installed);
+# below, direct convolution (np.convolve) was measured to be faster.
+FFT_WINDOW_THRESHOLD = 256
+
+# Max. size (bytes) of the (M, N) distance array computed at once when
+# searching the closest points to M points in a trajectory of N points;
+# larger arrays do not fit in CPU cache and were measured to be slower.
+BATCH_BYTES = 256 * 2**10
+
+# Window functions available for smoothing
+_windows = {'flat': lambda n: np.ones(n, 'd'),
+            'hanning': np.hanning,
+            'hamming': np.hamming,
+            'bartlett': np.bartlett,
+            'blackman': np.blackman}
+
+
+def _vincenty(pt1, pt2):
+    """Vincenty distance (km) between pt1 and pt2, each a (lat, long) tuple.
+
+    Uses the uvincenty C extension if installed, else the pure-Python
+    vincenty package.
+    """
+    if _vincenty_c is not None:
+        return _vincenty_c(pt1[0], pt1[1], pt2[0], pt2[1])
+    return _vincenty_py(pt1, pt2)
+
+
+def _fftconvolve():
+    """FFT convolution from scipy if installed (imported lazily), else None.
+
+    Overlap-add (oaconvolve) is used, faster than a single FFT (fftconvolve)
+    when the signal is much longer than the window.
+    """
+    try:
+        from scipy.signal import oaconvolve
+    except ImportError:
+        return None
+    return oaconvolve
+
+
+def _smoothing_kernel(w):
+    """Compiled convolution specialized for window w, or None if no numba."""
+    from ._kernels import smoothing_kernel  # numba imported at first use
+    return smoothing_kernel(tuple(w))
 
-def closest_pt(pt, trajectory):
+
+def closest_pt(pt, trajectory, refine=3):
     """Finds closest pt to pt (lat, long) in trajectory (lats, longs).
 
     Parameters
@@ -15,10 +77,77 @@ def closest_pt(pt, trajectory):
     - a tuple (lats, longs) where lats is an iterable of floats (and longs also)
     - a (2 * N) numpy array where N is the length of the trajectory
     - any other structure equivalent in terms of unpacking a, b = trajectory
+    refine: number of candidates (closest in the equirectangular approximation)
+            for which the exact (Vincenty) distance is calculated; if <= 1,
+            the equirectangular approximation is used alone (fastest).
+    """
+    lats, longs = trajectory
+    lats, longs = np.asarray(lats), np.asarray(longs)
+    lat0, long0 = pt
+
+    # Equirectangular approximation, sufficient to preselect candidates
+    # (longitude difference wrapped into [-180, 180), for the antimeridian)
+    dx = (longs - long0 + 180) % 360 - 180
+    dx *= math.cos(math.radians(lat0))
+    dy = lats - lat0
+    d2 = dx * dx + dy * dy
+
+    if refine <= 1:
+        return int(np.argmin(d2))
+
+    k = min(refine, d2.size)
+    candidates = np.argpartition(d2, k - 1)[:k]
+
+    ds = [_vincenty((lats[i], longs[i]), pt) for i in candidates]
+    return int(candidates[np.argmin(ds)])
+
+
+def closest_pts(pts, trajectory, refine=3):
+    """Same as closest_pt() for multiple pts, returns array of indices.
+
+    pts is an iterable of (lat, long) tuples, or a (M * 2) array.
+    Distances to all pts are computed by broadcasting (by chunks of pts
+    that fit in CPU cache), which is faster than calling closest_pt()
+    for each pt, in particular for short trajectories.
     """
     lats, longs = trajectory
-    ds = [vincenty((x, y), pt) for (x, y) in zip(lats, longs)]
-    return np.argmin(ds)
+    lats, longs = np.asarray(lats, dtype=float), np.asarray(longs, dtype=float)
+    pts = np.asarray(pts, dtype=float).reshape(-1, 2)
+
+    k = min(refine, lats.size) if refine > 1 else 1
+    indices = np.empty(len(pts), dtype=int)
+
+    chunk = max(1, BATCH_BYTES // (8 * lats.size))
+
+    for start in range(0, len(pts), chunk):
+
+        lat0 = pts[start:start + chunk, 0, None]
+        long0 = pts[start:start + chunk, 1, None]
+
+        # Equirectangular approximation (in place, no extra (M, N) arrays),
+        # longitude difference wrapped into [-180, 180) for the antimeridian
+        d2 = longs - long0
+        d2 += 180
+        d2 %= 360
+        d2 -= 180
+        d2 *= np.cos(np.radians(lat0))
+        d2 *= d2
+        dy = lats - lat0
+        dy *= dy
+        d2 += dy
+
+        if k == 1:
+            indices[start:start + chunk] = np.argmin(d2, axis=1)
+            continue
+
+        candidates = np.argpartition(d2, k - 1, axis=1)[:, :k]
+
+        for i, (pt, cands) in enumerate(zip(pts[start:start + chunk], candidates),
+                                        start=start):
+            ds = [_vincenty((lats[j], longs[j]), tuple(pt)) for j in cands]
+            indices[i] = cands[np.argmin(ds)]
+
+    return indices
 
 
 def compass(pt1, pt2):
@@ -81,26 +210,154 @@ def compass(pt1, pt2):
     >>> compass(pt1, pt2)
     array([  0., 180.,  90., 270.])
     """
+    (lat1, long1), (lat2, long2) = pt1, pt2
+    if all(np.isscalar(q) for q in (lat1, long1, lat2, long2)):
+        return _compass_scalar(lat1, long1, lat2, long2)
+
+    if np.size(lat1) >= COMPILED_THRESHOLD:
+
+        from ._kernels import compass_kernel  # numba imported at first use
+
+        if compass_kernel is not None:
+            lat1, long1 = np.asarray(pt1, dtype=float)
+            lat2, long2 = np.asarray(pt2, dtype=float)
+            if lat1.ndim == 1 and lat1.shape == lat2.shape:
+                out = np.empty(lat1.size)
+                compass_kernel(lat1, long1, lat2, long2, out)
+                return out
+
     lat1, long1 = np.radians(pt1)
     lat2, long2 = np.radians(pt2)
 
     d_long = long2 - long1
 
-    x = np.sin(d_long) * np.cos(lat2)
-    y = np.cos(lat1) * np.sin(lat2) - (np.sin(lat1) * np.cos(lat2) * np.cos(d_long))
+    cos_lat2 = np.cos(lat2)  # used twice, computed once
+
+    x = np.sin(d_long) * cos_lat2
+    y = np.cos(lat1) * np.sin(lat2) - (np.sin(lat1) * cos_lat2 * np.cos(d_long))
 
     initial_bearing = np.arctan2(x, y)
 
     # Now we have the initial bearing but np.arctan2 return values
     # from -180° to + 180° which is not what we want for a compass bearing
-    # The solution is to normalize the initial bearing as shown below
-    initial_bearing = np.degrees(initial_bearing)
-    compass_bearing = (initial_bearing + 360) % 360
+    return _normalize_bearing(np.degrees(initial_bearing))
+
+
+def _normalize_bearing(bearing):
+    """Bearing (°) from arctan2 range [-180, 180] to compass range [0, 360).
+
+    360° is added to negative values, and values rounded to 360 (e.g.
+    -1e-15 + 360) are set to 0; branchless, faster than a modulo. Works
+    for floats as well as numpy arrays.
+    """
+    bearing = bearing + 360.0 * (bearing < 0)
+    return bearing * (bearing < 360.0)
+
+
+def _compass_scalar(lat1, long1, lat2, long2):
+    """Same as compass() for individual points, with math instead of numpy."""
+    lat1, lat2 = math.radians(lat1), math.radians(lat2)
+    d_long = math.radians(long2 - long1)
+
+    cos_lat2 = math.cos(lat2)
+
+    x = math.sin(d_long) * cos_lat2
+    y = math.cos(lat1) * math.sin(lat2) - (math.sin(lat1) * cos_lat2 * math.cos(d_long))
+
+    return _normalize_bearing(math.degrees(math.atan2(x, y)))
+
+
+def haversine(pt1, pt2):
+    """Great-circle distance (km) between two points (haversine formula).
+
+    Faster than the Vincenty formula and vectorized, at the cost of a small
+    error (< 0.5%) due to the assumption of a spherical Earth.
+
+    Parameters
+    ----------
+    pt1, pt2: positions (latitude/longitude in °) of first/second point,
+              with the same possible structures as in compass()
+
+    Output
+    ------
+    Distance in km (float or numpy array)
+
+    Examples
+    --------
+    >>> round(haversine((0, 0), (0, 1)), 3)
+    111.195
+    """
+    (lat1, long1), (lat2, long2) = pt1, pt2
+    if all(np.isscalar(q) for q in (lat1, long1, lat2, long2)):
+        return _haversine_scalar(lat1, long1, lat2, long2)
+
+    lat1, long1 = np.radians(pt1)
+    lat2, long2 = np.radians(pt2)
+    return _haversine_radians(lat1, long1, lat2, long2)
 
-    return compass_bearing
 
+def _haversine_scalar(lat1, long1, lat2, long2):
+    """Same as haversine() for individual points, with math instead of numpy."""
+    lat1, lat2 = math.radians(lat1), math.radians(lat2)
+    d_long = math.radians(long2 - long1)
 
-def smooth(x, n=5, window='hanning'):
+    a = math.sin((lat2 - lat1) / 2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(d_long / 2)**2
+
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+def _haversine_radians(lat1, long1, lat2, long2):
+    """Haversine distance (km) between positions already in radians."""
+    d_lat = lat2 - lat1
+    d_long = long2 - long1
+
+    a = np.sin(d_lat / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(d_long / 2)**2
+
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+def _cumulative_haversine(cos_lat, d_lat, d_long):
+    """Cumulative haversine distance (km) along trajectory.
+
+    Calculated from cos(lat) of each point and latitude/longitude increments
+    between consecutive points (all in radians), so that these can be shared
+    with other calculations (e.g. compass).
+    """
+    a = np.sin(d_lat / 2)**2 + cos_lat[:-1] * cos_lat[1:] * np.sin(d_long / 2)**2
+    ds = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+    return _cumulative_sum(ds)
+
+
+def _cumulative_equirectangular(cos_lat, d_lat, d_long):
+    """Cumulative distance (km) along trajectory, equirectangular approximation.
+
+    Same inputs as _cumulative_haversine(). Faster (no trigonometric function,
+    cos(lat) of each segment taken as the mean of its ends, which are shared
+    with other calculations), and accurate for the short segments found in
+    usual tracks (points a few meters apart).
+    """
+    dx = cos_lat[:-1] + cos_lat[1:]
+    dx *= d_long / 2
+    dx *= dx
+    dx += d_lat * d_lat
+    ds = np.sqrt(dx, out=dx)
+    ds *= EARTH_RADIUS
+    return _cumulative_sum(ds)
+
+
+def _cumulative_sum(ds):
+    """Cumulative sum of increments ds, starting at 0 (one more element than ds).
+
+    Written in place in a preallocated array (no concatenation copy).
+    """
+    out = np.empty(ds.size + 1)
+    out[0] = 0
+    np.cumsum(ds, out=out[1:])
+    return out
+
+
+def smooth(x, n=5, window='hanning', compiled=False):
     """Smooth 1-d data with a window of requested size and type.
 
     Simplified version of numbo.smooth with smaller default window size (n)
@@ -117,6 +374,9 @@ def smooth(x, n=5, window='hanning'):
     - `n`: the dimension of the smoothing window; should be an odd integer
     - `window`: the type of window ('flat', 'hanning', 'hamming', 'bartlett',
     'blackman'); flat window will produce a moving average smoothing.
+    - `compiled`: if True and numba is installed, use a numba kernel
+    specialized for the (n, window) combination; faster for small windows,
+    but compiled at first use, so only worth it for many repeated calls.
 
     OUTPUT
     ------
@@ -141,20 +401,28 @@ def smooth(x, n=5, window='hanning'):
     if n == 1:  # no need to apply filter
         return x
 
-    if window not in ['flat', 'hanning', 'hamming', 'bartlett', 'blackman']:
+    if window not in _windows:
         msg = "Only possible windows: 'flat', 'hanning', 'hamming', 'bartlett', 'blackman'"
         raise ValueError(msg)
 
-    xadd_left = 2 * x[0] - x[n:0:-1]
-    xadd_right = 2 * x[-1] - x[-2:-n - 2:-1]
-    x_expanded = np.concatenate((xadd_left, x, xadd_right))
+    # point-reflected copies of n points at both ends, i.e.
+    # 2 * x[0] - x[n:0:-1] on the left, 2 * x[-1] - x[-2:-n - 2:-1] on the right
+    x_expanded = np.pad(x, n, mode='reflect', reflect_type='odd')
 
-    if window == 'flat':  # moving average
-        w = np.ones(n, 'd')
+    if window == 'flat':  # moving average, O(N) with cumulative sum
+        c = np.cumsum(np.insert(x_expanded, 0, 0))
+        y = (c[n:] - c[:-n]) / n
     else:
-        w = eval('np.' + window + '(n)')
-
-    y = np.convolve(w / w.sum(), x_expanded, mode='valid')
+        w = _windows[window](n)
+        w = w / w.sum()
+        kernel = _smoothing_kernel(w) if compiled else None
+        fftconvolve = _fftconvolve() if n >= FFT_WINDOW_THRESHOLD else None
+        if kernel is not None:
+            y = kernel(x_expanded)
+        elif fftconvolve is not None:
+            y = fftconvolve(x_expanded, w, mode='valid')
+        else:
+            y = np.convolve(w, x_expanded, mode='valid')
 
     istart = int(n / 2) + 1
 
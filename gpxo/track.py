@@ -1,14 +1,17 @@
 """General tools for gpx data processing based on gpxpy."""
 
+from datetime import timedelta
+from functools import wraps
+from operator import attrgetter
+import warnings
+
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 
-import gpxpy
-from vincenty import vincenty
-import mplleaflet
+# Note: gpxpy, pandas, matplotlib, mplleaflet and optional dependencies
+# (numba, scikit-learn, pyarrow) are imported when needed to keep import fast
 
-from .general import smooth, closest_pt
+from .general import smooth, closest_pt, closest_pts, COMPILED_THRESHOLD
+from .general import _cumulative_haversine, _cumulative_equirectangular, _normalize_bearing
 
 
 # =============================== Misc. Config ===============================
@@ -22,150 +25,468 @@ shortnames = {'t': 'time',
               'z': 'elevation (m)',
               'c': 'compass (°)'}
 
+_valid_shortnames = frozenset(shortnames)
+
+# Track attributes corresponding to short names
+_shortname_attributes = {'t': 'time',
+                         's': 'seconds',
+                         'd': 'distance',
+                         'v': 'velocity',
+                         'z': 'elevation',
+                         'c': 'compass'}
+
 
 # ========================= Misc. private functions ==========================
 
 
-# Function to transform array of timedeltas to seoncds
-_total_seconds = np.vectorize(lambda dt: dt.total_seconds())
+# Cached values (properties, spatial index) depending on each basic attribute,
+# i.e. to invalidate when that attribute is modified
+_position_dependents = ('_radians', '_increments', 'distance', 'compass',
+                        'velocity', 'data', 'index')
 
+_cache_dependents = {'latitude': _position_dependents,
+                     'longitude': _position_dependents,
+                     'elevation': ('data',),
+                     'time': ('seconds', 'velocity', 'data'),
+                     'utc_offset': ('seconds', 'velocity', 'data'),
+                     'distance_method': ('distance', 'compass', 'velocity', 'data')}
 
-# ============================ Main class (Track) ============================
+# UTC offset of naive times (no timezone info)
+_NO_OFFSET = timedelta(0)
 
-class Track:
+# Basic attributes stored as contiguous float64 arrays
+_coordinate_attributes = ('latitude', 'longitude', 'elevation')
+
+
+def _cached_property(method):
+    """Property cached in self._cache until an attribute it depends on is modified."""
+    name = method.__name__
+
+    @wraps(method)
+    def getter(self):
+        try:
+            return self._cache[name]
+        except KeyError:
+            value = self._cache[name] = method(self)
+            return value
+
+    return property(getter)
+
+
+# If some elevation or time data is missing, data is set to None. Since
+# points usually either all have or all lack a given data, missing data is
+# first detected from the first point (O(1)), then from failed conversions.
+
+def _to_datetime64(times, prepare):
+    """datetime64 array from list of times, each converted by prepare() first.
+
+    Returns None if time is missing for any point.
+    """
+    if not times or times[0] is None:
+        return None
+    try:
+        return np.array([prepare(t) for t in times], dtype='datetime64[ns]')
+    except AttributeError:  # prepare(None)
+        return None
+
+
+def _utc_offsets(times, utc_offset):
+    """UTC offsets (timedelta64) of times, each obtained by utc_offset().
+
+    Returns None if the offset is the same for all points (usual case, where
+    durations can be calculated from local times directly), or if time
+    is missing.
+    """
+    if not times or times[0] is None:
+        return None
+    try:
+        offsets = np.array([utc_offset(t) for t in times], dtype='timedelta64[s]')
+    except AttributeError:  # utc_offset(None)
+        return None
+    return None if np.all(offsets == offsets[0]) else offsets
+
+
+def _to_float(values):
+    """float array from list of values (or None if any value is missing)."""
+    if not values or values[0] is None:
+        return None
+    array = np.array(values, dtype=float)  # None converted to NaN
+    return None if np.isnan(array).any() else array
+
+
+def _load_gpxpy(filename, track=0, segment=0):
+    """Load (latitude, longitude, elevation, time, utc_offset) arrays using gpxpy.
+
+    elevation / time are None if data is missing for some points,
+    utc_offset is None if it is the same for all points (see _utc_offsets()).
+    """
+    import gpxpy
+
+    with open(filename, 'r') as gpx_file:
+        gpx = gpxpy.parse(gpx_file)
+
+    pts = gpx.tracks[track].segments[segment].points
+
+    # Iteration over points and attribute access done in C (attrgetter)
+    n = len(pts)
+    latitude = np.fromiter(map(attrgetter('latitude'), pts), float, count=n)
+    longitude = np.fromiter(map(attrgetter('longitude'), pts), float, count=n)
+    elevations = list(map(attrgetter('elevation'), pts))
+    times = list(map(attrgetter('time'), pts))
+
+    # local (wall-clock) time, stored once as datetime64
+    time = _to_datetime64(times, lambda t: t.replace(tzinfo=None))
+    utc_offset = _utc_offsets(times, lambda t: t.utcoffset() or _NO_OFFSET)
+
+    return latitude, longitude, _to_float(elevations), time, utc_offset
+
+
+def _local_name(tag):
+    """XML tag without namespace, e.g. '{http://...GPX/1/1}trkpt' -> 'trkpt'."""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _load_stream(filename, track=0, segment=0):
+    """Same as _load_gpxpy(), streaming the XML file without gpxpy.
+
+    Points are read as the file is parsed (xml.etree iterparse) and removed
+    from the XML tree once read, so that memory use does not grow with the
+    number of points; parsing stops after the requested segment.
+    """
+    from xml.etree.ElementTree import iterparse
+
+    latitude, longitude, elevations, times = [], [], [], []
+
+    # The current track / segment number is the number of tracks / segments
+    # already ended; start events are only used to keep a reference to the
+    # current segment element, from which read points are removed.
+    i_track = i_segment = 0
+    in_segment = (track == 0 and segment == 0)
+    found = False
+    segment_elem = None
+
+    for event, elem in iterparse(filename, events=('start', 'end')):
+
+        if event == 'start':
+            if elem.tag.endswith('trkseg'):
+                segment_elem = elem
+            continue
+
+        name = _local_name(elem.tag)
+
+        if name == 'trkpt':
+            if in_segment:
+                latitude.append(float(elem.get('lat')))
+                longitude.append(float(elem.get('lon')))
+                ele = time = None
+                for child in elem:
+                    child_name = _local_name(child.tag)
+                    if child_name == 'ele':
+                        ele = child.text
+                    elif child_name == 'time':
+                        time = child.text
+                elevations.append(ele)
+                times.append(time)
+            if segment_elem is not None:
+                segment_elem.remove(elem)  # free memory of already read points
+            continue
+
+        if name == 'trkseg':
+            if in_segment:
+                found = True
+                break
+            i_segment += 1
+            elem.clear()
+        elif name == 'trk':
+            i_track += 1
+            i_segment = 0
+            elem.clear()
+        else:
+            continue
+
+        in_segment = (i_track == track and i_segment == segment)
+
+    if not found:
+        raise IndexError(f'Track {track} / segment {segment} not found in {filename}')
+
+    latitude = np.array(latitude)
+    longitude = np.array(longitude)
+
+    # local (wall-clock) time: timezone info (Z or ±hh:mm offset) removed
+    time = _to_datetime64(times, lambda t: _strip_timezone(t.strip()))
+    utc_offset = _utc_offsets(times, lambda t: _utc_offset(t.strip()))
+
+    return latitude, longitude, _to_float(elevations), time, utc_offset
+
+
+def _timezone_index(timestr):
+    """Index where timezone info starts in ISO time string (None if no info).
 
-    def __init__(self, filename, track=0, segment=0):
+    Offsets can be written Z, ±hh:mm, ±hhmm or ±hh (sign after the time
+    separator 'T', to not mistake the date hyphens for an offset).
+    """
+    if timestr.endswith('Z'):
+        return len(timestr) - 1
+    i_offset = max(timestr.rfind('+'), timestr.rfind('-'))
+    if i_offset > timestr.find('T') >= 0:
+        return i_offset
+    return None
 
-        with open(filename, 'r') as gpx_file:
-            gpx = gpxpy.parse(gpx_file)
 
-        pts = gpx.tracks[track].segments[segment].points
+def _strip_timezone(timestr):
+    """Remove timezone info from ISO time string, e.g. '...38Z' -> '...38'."""
+    i_offset = _timezone_index(timestr)
+    return timestr if i_offset is None else timestr[:i_offset]
 
-        self.latitude = np.array([pt.latitude for pt in pts])
-        self.longitude = np.array([pt.longitude for pt in pts])
-        self.elevation = np.array([pt.elevation for pt in pts])
-        self.time = np.array([pt.time for pt in pts])
 
-        # If some elevation or time data is missing, just set attribute to None
+def _utc_offset(timestr):
+    """UTC offset (s) of ISO time string, e.g. '...38+02:00' -> 7200."""
+    i_offset = _timezone_index(timestr)
+    if i_offset is None or timestr[i_offset] == 'Z':
+        return 0
+    digits = timestr[i_offset + 1:].replace(':', '')
+    offset = 3600 * int(digits[:2]) + 60 * int(digits[2:] or 0)
+    return -offset if timestr[i_offset] == '-' else offset
 
-        if any(self.time == None):
-            self.time = None
 
-        if any(self.elevation == None):
-            self.elevation = None
+def _unit_vectors(positions):
+    """(N * 3) cartesian coordinates on unit sphere of (N * 2) (lat, long) in radians."""
+    lat, long = positions.T
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(long), cos_lat * np.sin(long), np.sin(lat)))
 
-    @staticmethod
-    def _distance(position1, position2):
-        """Distance between two positions (latitude, longitude)."""
-        return vincenty(position1, position2)
+
+def _decimate(n, max_points):
+    """Indices of at most max_points regularly spaced points among n points.
+
+    First and last points are always included (max_points >= 2).
+    """
+    if max_points < 2:
+        raise ValueError(f'max_points should be at least 2, not {max_points}')
+    if n <= max_points:
+        return np.arange(n)
+    step = -(-(n - 1) // (max_points - 1))  # ceil division
+    return np.append(np.arange(0, n - 1, step), n - 1)
+
+
+# Functions to load GPX data into numpy arrays
+_parsers = {'gpxpy': _load_gpxpy,
+            'stream': _load_stream}
+
+
+# ============================ Main class (Track) ============================
+
+class Track:
+
+    def __init__(self, filename, track=0, segment=0, distance_method='haversine',
+                 parser='gpxpy'):
+
+        self._cache = {}
+
+        try:
+            load = _parsers[parser]
+        except KeyError:
+            raise ValueError(f'Unknown parser: {parser}. Possible parsers: '
+                             f'{", ".join(_parsers)}')
+
+        (self.latitude, self.longitude, self.elevation, self.time,
+         self.utc_offset) = load(filename, track=track, segment=segment)
+
+        # 'haversine' (fast, vectorized), 'vincenty' (exact, slow), or
+        # 'equirectangular' (fastest, approximation for closely spaced points)
+        self.distance_method = distance_method
+
+    def __setattr__(self, name, value):
+        """Invalidate cached properties when basic attributes are modified."""
+        if name in _coordinate_attributes and value is not None:
+            # contiguous float64 buffers for the vectorized / compiled kernels
+            value = np.ascontiguousarray(value, dtype=np.float64)
+        super().__setattr__(name, value)
+        for dependent in _cache_dependents.get(name, ()):
+            self._cache.pop(dependent, None)
+
+    def clear_cache(self):
+        """Force recalculation of property attributes (distance, data etc.)
+
+        Needed only after in-place modification of basic attributes
+        (e.g. track.latitude[0] = 45); reassignment clears cache automatically.
+        """
+        self._cache.clear()
 
     def _resample(self, quantity, reference):
         """Resample quantities (velocity, compass) to fall back on reference
 
-        Reference is typically time or distance."""
-        # midpoints correponding to shifted quantity
-        midpts = reference[:-1] + (np.diff(reference) / 2)
-        # linear interpolation to fall back to initial times
-        qty_resampled = np.interp(reference, midpts, quantity)
+        Reference is typically time or distance. quantity can be 2D to
+        resample several quantities at once (one quantity per row)."""
+        # Linear interpolation between midpoints of reference (where quantity
+        # is defined) has a closed form that avoids np.interp's binary search:
+        # q(r[i]) = q[i-1] + (q[i] - q[i-1]) * (r[i] - r[i-1]) / (r[i+1] - r[i-1])
+        dr = np.diff(reference)
+        span = dr[:-1] + dr[1:]
+
+        if not np.all(span > 0):  # reference not strictly increasing
+            midpts = reference[:-1] + (dr / 2)
+            if quantity.ndim == 1:
+                return np.interp(reference, midpts, quantity)
+            return np.array([np.interp(reference, midpts, q) for q in quantity])
+
+        qty_resampled = np.empty(quantity.shape[:-1] + reference.shape)
+        qty_resampled[..., 0] = quantity[..., 0]
+        qty_resampled[..., -1] = quantity[..., -1]
+        qty_resampled[..., 1:-1] = quantity[..., :-1] + np.diff(quantity) * dr[:-1] / span
         return qty_resampled
 
-    @property
+    @_cached_property
+    def _radians(self):
+        """Latitude and longitude in radians, shared by distance and compass."""
+        return np.radians(self.latitude), np.radians(self.longitude)
+
+    @_cached_property
+    def _increments(self):
+        """cos(lat) and lat/long increments (radians), for distance and compass.
+
+        Longitude increments are wrapped into [-pi, pi), for tracks crossing
+        the antimeridian (±180°).
+        """
+        lat, long = self._radians
+        d_long = np.diff(long)
+        d_long += np.pi
+        d_long %= 2 * np.pi
+        d_long -= np.pi
+        return np.cos(lat), np.diff(lat), d_long
+
+    @_cached_property
     def seconds(self):
         if self.time is not None:
-            return _total_seconds(self.time - self.time[0])
+            duration = self.time - self.time[0]
+            if self.utc_offset is not None:  # e.g. daylight saving time change
+                duration -= self.utc_offset - self.utc_offset[0]
+            return duration / np.timedelta64(1, 's')
 
-    @property
+    @_cached_property
     def distance(self):
         """Travelled distance in kilometers."""
+        if self.distance_method == 'haversine':
+            if self.latitude.size >= COMPILED_THRESHOLD:
+                from ._kernels import cum_haversine
+                if cum_haversine is not None:
+                    return cum_haversine(self.latitude, self.longitude)
+            cos_lat, d_lat, d_long = self._increments
+            return _cumulative_haversine(cos_lat, d_lat, d_long)
+        elif self.distance_method == 'equirectangular':
+            cos_lat, d_lat, d_long = self._increments
+            return _cumulative_equirectangular(cos_lat, d_lat, d_long)
+        elif self.distance_method == 'vincenty':
+            from ._kernels import cum_vincenty  # numba or numpy version
+            return cum_vincenty(self.latitude, self.longitude)
+        else:
+            raise ValueError(f'Unknown distance method: {self.distance_method}')
 
-        ds = [0]
-
-        x1s = self.latitude[:-1]
-        x2s = self.latitude[1:]
-
-        y1s = self.longitude[:-1]
-        y2s = self.longitude[1:]
-
-        for x1, x2, y1, y2 in zip(x1s, x2s, y1s, y2s):
-            dd = self._distance((x1, y1), (x2, y2))
-            ds.append(dd)
-
-        return np.cumsum(ds)
-
-    @property
+    @_cached_property
     def compass(self):
         """Compass bearing in decimal degrees (°). See gpxo.compass"""
-        lat1, long1 = np.radians((self.latitude[:-1], self.longitude[:-1]))
-        lat2, long2 = np.radians((self.latitude[1:], self.longitude[1:]))
-
-        d_long = long2 - long1
-
-        x = np.sin(d_long) * np.cos(lat2)
-        y = np.cos(lat1) * np.sin(lat2) - (np.sin(lat1) * np.cos(lat2) * np.cos(d_long))
+        x, y = self._compass_xy()
 
         # Resample before taking arctan because if not, interpolation fails
         # when the signal fluctuates between 0 and 360° when compass is N
-        x_res = self._resample(x, self.distance)
-        y_res = self._resample(y, self.distance)
+        # (x and y resampled together, sharing interpolation weights)
+        x_res, y_res = self._resample(np.array((x, y)), self.distance)
 
         initial_bearing = np.arctan2(x_res, y_res)
 
         # Now we have the initial bearing but np.arctan2 return values
         # from -180° to + 180° which is not what we want for a compass bearing
-        # The solution is to normalize the initial bearing as shown below
-        initial_bearing = np.degrees(initial_bearing)
-        compass_bearing = (initial_bearing + 360) % 360
+        return _normalize_bearing(np.degrees(initial_bearing))
+
+    def _compass_xy(self):
+        """x, y components of compass bearing between successive points."""
+        n = self.latitude.size
+        if n >= COMPILED_THRESHOLD:
+            from ._kernels import compass_xy
+            if compass_xy is not None:
+                x, y = np.empty(n - 1), np.empty(n - 1)
+                compass_xy(self.latitude, self.longitude, x, y)
+                return x, y
+
+        # sin/cos of each latitude computed once, shared by pts 1 and 2
+        cos_lat, _, d_long = self._increments
+        sin_lat = np.sin(self._radians[0])
 
-        return compass_bearing
+        x = np.sin(d_long) * cos_lat[1:]
+        y = cos_lat[:-1] * sin_lat[1:] - (sin_lat[:-1] * cos_lat[1:] * np.cos(d_long))
 
-    @property
+        return x, y
+
+    @_cached_property
     def velocity(self):
         """Instantaneous velocity in km/h."""
         if self.time is not None:
-            dt = np.diff(self.seconds)
-            dd = np.diff(self.distance)
-            vs = 3600 * dd / dt
-            return self._resample(vs, self.seconds)
+            seconds = self.seconds
+            vs = 3600 * np.diff(self.distance) / np.diff(seconds)
+            return self._resample(vs, seconds)
         else:
             return None
 
-    @property
+    @_cached_property
     def data(self):
         """pd.DataFrame with all track data (time, position, velocity etc.)"""
+        import pandas as pd
+
+        if self.time is not None:
+            index = pd.DatetimeIndex(self.time, name='time')
+        else:
+            index = None
+
+        # arrays are already typed (float / datetime64): no type inference
+        return pd.DataFrame(self._columns(), index=index, copy=False)
 
-        names = ['latitude (°)', 'longitude (°)', 'distance (km)', 'compass (°)']
-        columns = [self.latitude, self.longitude, self.distance, self.compass]
+    def _columns(self):
+        """dict {column name: numpy array} of all track data except time.
+
+        Positions are kept in float64 (float32 would limit precision to ~1 m),
+        other quantities are downcast to float32 to halve memory use.
+        """
+        columns = {'latitude (°)': self.latitude,
+                   'longitude (°)': self.longitude,
+                   'distance (km)': self.distance,
+                   'compass (°)': self.compass}
 
         if self.time is not None:
-            names += ['time', ' duration (s)', 'velocity (km/h)']
-            columns += [self.time, self.seconds, self.velocity]
+            columns['duration (s)'] = self.seconds
+            columns['velocity (km/h)'] = self.velocity
 
         if self.elevation is not None:
-            names.append('elevation (m)')
-            columns.append(self.elevation)
+            columns['elevation (m)'] = self.elevation
 
-        data = pd.DataFrame(dict(zip(names, columns)))
+        for name, column in columns.items():
+            if name not in ('latitude (°)', 'longitude (°)'):
+                columns[name] = column.astype(np.float32)
 
-        if self.time is not None:
-            data['time'] = data['time'].dt.tz_localize(None)
-            data.set_index('time', inplace=True)
+        return columns
+
+    def to_arrow(self):
+        """pyarrow Table with all track data, built without pandas.
+
+        Same columns and types as self.data (see _columns(): derived
+        quantities are copied as float32, positions and time are passed to
+        pyarrow without copy); faster than self.data for export (e.g.
+        pyarrow.parquet.write_table, or pyarrow.csv.write_csv).
+        Requires pyarrow.
+        """
+        import pyarrow as pa
 
-        return data
+        columns = {} if self.time is None else {'time': self.time}
+        columns.update(self._columns())
+
+        return pa.table(columns)
 
     def _shortname_to_column(self, name):
-        """shorname to column name in self.data."""
-        try:
-            cname = shortnames[name]
-        except KeyError:
-            raise ValueError(f'Invalid short name: {name}. ')
+        """shortname to column name and data (array attribute, not self.data)."""
+        cname = shortnames[name]
+        column = getattr(self, _shortname_attributes[name])
 
-        if cname == 'time':
-            column = self.data.index
-        else:
-            try:
-                column = self.data[cname]
-            except KeyError:
-                raise KeyError(f'{cname} Data unavailable in current track. ')
+        if column is None:
+            raise KeyError(f'{cname} Data unavailable in current track. ')
 
         return {'name': cname, 'column': column}
 
@@ -191,12 +512,12 @@ class Track:
         'z': 'elevation (m)'
         'c': 'compass (°)'
         """
-        try:
-            xname, yname = mode
-        except ValueError:
-            raise ValueError('Invalid plot mode (should be two letters, e.g. '
+        if len(mode) != 2 or not _valid_shortnames.issuperset(mode):
+            raise ValueError('Invalid plot mode (should be two short names, e.g. '
                              f"'tv', not {mode}")
 
+        xname, yname = mode
+
         xinfo = self._shortname_to_column(xname)
         xlabel = xinfo['name']
         x = xinfo['column']
@@ -205,6 +526,8 @@ class Track:
         ylabel = yinfo['name']
         y = yinfo['column']
 
+        import matplotlib.pyplot as plt
+
         fig, ax = plt.subplots()
         ax.plot(x, y, *args, **kwargs)
 
@@ -216,24 +539,73 @@ class Track:
 
         return ax
 
-    def smooth(self, n=5, window='hanning'):
+    def smooth(self, n=5, window='hanning', compiled=False):
         """Smooth position data (and subsequently distance, velocity etc.)
 
         Parameters
         ----------
         - n: size of moving window for smoothing
         - window: type of window (e.g. 'hanning' or 'flat', see gpxo.smooth())
+        - compiled: use numba kernel specialized for (n, window), see gpxo.smooth()
+        """
+        kwargs = {'n': n, 'window': window, 'compiled': compiled}
+        self.latitude = smooth(self.latitude, **kwargs)
+        self.longitude = smooth(self.longitude, **kwargs)
+        if self.elevation is not None:
+            self.elevation = smooth(self.elevation, **kwargs)
+
+    def build_index(self):
+        """Build spatial index to speed up repeated closest_to() calls.
+
+        Uses a BallTree (haversine metric) from scikit-learn if installed,
+        else a cKDTree from scipy on positions projected on the unit sphere
+        (the chord distance increases with the great-circle distance).
+        If neither is installed, a warning is issued and closest_to() keeps
+        using a linear scan. The index is discarded when latitude or longitude
+        are modified (e.g. by smooth()).
+        """
+        positions = np.radians(np.column_stack((self.latitude, self.longitude)))
+        try:
+            from sklearn.neighbors import BallTree
+        except ImportError:
+            pass
+        else:
+            tree = BallTree(positions, metric='haversine')
+            self._cache['index'] = lambda pts: tree.query(np.radians(pts), k=1)[1][:, 0]
+            return
+
+        try:
+            from scipy.spatial import cKDTree
+        except ImportError:
+            warnings.warn('Neither scikit-learn nor scipy installed, no index built.')
+            return
+        tree = cKDTree(_unit_vectors(positions))
+        self._cache['index'] = lambda pts: tree.query(_unit_vectors(np.radians(pts)), k=1)[1]
+
+    def closest_to(self, pt, refine=3):
+        """Find index of point in trajectory that is closest to pt=(lat, long).
+
+        refine: see gpxo.closest_pt() (not used if index built with build_index())
         """
-        self.latitude = smooth(self.latitude, n=n, window=window)
-        self.longitude = smooth(self.longitude, n=n, window=window)
-        self.elevation = smooth(self.elevation, n=n, window=window)
+        try:
+            query = self._cache['index']
+        except KeyError:
+            return closest_pt(pt, (self.latitude, self.longitude), refine=refine)
+        return int(query(np.reshape(pt, (1, 2)))[0])
 
-    def closest_to(self, pt):
-        """Find index of point in trajectory that is closest to pt=(lat, long)."""
-        return closest_pt(pt, (self.latitude, self.longitude))
+    def closest_to_many(self, pts, refine=3):
+        """Same as closest_to() for multiple pts [(lat, long), ...], vectorized.
+
+        Returns numpy array of indices; refine: see gpxo.closest_pt()
+        """
+        try:
+            query = self._cache['index']
+        except KeyError:
+            return closest_pts(pts, (self.latitude, self.longitude), refine=refine)
+        return query(np.reshape(pts, (-1, 2)))
 
     def map(self, map_type='osm', embed=False, ax=None, size=(10, 10),
-            plot='plot', **kwargs):
+            plot='plot', max_points=None, **kwargs):
         """Plot trajectory on map.
 
         Parameters
@@ -250,17 +622,29 @@ class Track:
 
         - plot: 'plot' or 'scatter'
 
+        - max_points: if not None (and >= 2), plot at most max_points
+        regularly spaced points (first and last points included), to keep
+        plotting fast for long tracks.
+
         - **kwargs: any plt.plot or plt.scatter keyword arguments
         """
+        import matplotlib.pyplot as plt
+        import mplleaflet
+
         if ax is None:
             fig, ax = plt.subplots(figsize=size)
         else:
             fig = ax.figure
 
+        long, lat = self.longitude, self.latitude
+        if max_points is not None:
+            pts = _decimate(lat.size, max_points)
+            long, lat = long[pts], lat[pts]
+
         if plot == 'plot':
-            ax.plot(self.longitude, self.latitude, '.-r', **kwargs)
+            ax.plot(long, lat, '.-r', **kwargs)
         elif plot == 'scatter':
-            ax.scatter(self.longitude, self.latitude, **kwargs)
+            ax.scatter(long, lat, **kwargs)
         else:
             raise ValueError(f'Unrecognized plot type: {plot}')
 
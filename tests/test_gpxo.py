@@ -1,8 +1,11 @@
 """Partial tests (pytest) for the gpxo module."""
 
+import sys
+
 import numpy as np
+import pytest
 import gpxo
-from gpxo import compass, closest_pt
+from gpxo import compass, closest_pt, closest_pts, haversine
 
 
 def test_loadtrack():
@@ -12,12 +15,163 @@ def test_loadtrack():
     assert round(track.data['velocity (km/h)'].iloc[4]) == 14
 
 
+def test_seconds():
+    """Durations from datetime64 times (float seconds since track start)."""
+    track = gpxo.Track('ExampleTrack.gpx')
+    assert track.time.dtype == np.dtype('datetime64[ns]')
+    assert track.seconds.dtype == np.float64
+    assert track.seconds[0] == 0 and track.seconds[2] == 4
+
+
+def test_to_arrow():
+    """Export to pyarrow table, with same columns as track.data."""
+    pytest.importorskip('pyarrow')
+    track = gpxo.Track('ExampleTrack.gpx')
+    table = track.to_arrow()
+    assert table.column_names == ['time'] + list(track.data.columns)
+    assert 'duration (s)' in table.column_names
+    assert table.num_rows == len(track.data)
+    assert str(table.schema.field('latitude (°)').type) == 'double'
+    assert str(table.schema.field('velocity (km/h)').type) == 'float'  # float32
+
+
+def test_column_dtypes():
+    """Positions in float64, other quantities downcast to float32 in track.data."""
+    track = gpxo.Track('ExampleTrack.gpx')
+    dtypes = track.data.dtypes
+    assert dtypes['latitude (°)'] == np.float64 and dtypes['longitude (°)'] == np.float64
+    for column in ('distance (km)', 'compass (°)', 'duration (s)',
+                   'velocity (km/h)', 'elevation (m)'):
+        assert dtypes[column] == np.float32
+
+
+def test_stream_parser():
+    """Streaming XML parser gives same data as gpxpy."""
+    for filename in 'ExampleTrack.gpx', 'ExampleTrack_NoTime.gpx':
+        track1 = gpxo.Track(filename)
+        track2 = gpxo.Track(filename, parser='stream')
+        assert track1.data.equals(track2.data)
+
+
 def test_loadtrack_notime():
     """Loading in situation where GPX does not have time info."""
     track = gpxo.Track('ExampleTrack_NoTime.gpx')
     assert round(track.data['compass (°)'].iloc[3]) == 92
 
 
+def test_distance_methods():
+    """Haversine (default), Vincenty and equirectangular distances should agree."""
+    track = gpxo.Track('ExampleTrack.gpx')
+    d_haversine = track.distance[-1]
+    track.distance_method = 'vincenty'
+    d_vincenty = track.distance[-1]
+    assert round(d_vincenty, 1) == 19.4
+    assert abs(d_haversine - d_vincenty) < 0.005 * d_vincenty
+    track.distance_method = 'equirectangular'
+    assert abs(track.distance[-1] - d_haversine) < 1e-6 * d_haversine
+
+
+def test_antimeridian():
+    """Distances should not be affected by a track crossing ±180° longitude."""
+    track = gpxo.Track('ExampleTrack.gpx')
+    distances = {}
+    for method in 'haversine', 'vincenty', 'equirectangular':
+        track.distance_method = method
+        distances[method] = track.distance[-1]
+    # shift track so that it crosses the antimeridian
+    long = track.longitude - track.longitude.mean() + 180
+    track.longitude = (long + 180) % 360 - 180
+    assert track.longitude.min() < -179 and track.longitude.max() > 179
+    for method, d in distances.items():
+        track.distance_method = method
+        assert abs(track.distance[-1] - d) < 1e-3 * d
+
+
+def test_vincenty_numpy():
+    """Vectorized numpy Vincenty (used when numba is missing) vs. scalar."""
+    from gpxo._kernels import _cum_vincenty_numpy
+    from gpxo.general import _vincenty
+    lats = np.array([45.011, 45.012, 45.012, 0, 0, -30])
+    longs = np.array([5.883, 5.886, 5.886, 0, 90, 170])
+    ds = [_vincenty(*pts) for pts in zip(zip(lats, longs), zip(lats[1:], longs[1:]))]
+    assert np.allclose(np.diff(_cum_vincenty_numpy(lats, longs)), ds, atol=1e-6)
+
+
+def test_cum_haversine_kernel():
+    """Compiled haversine (used for long tracks) vs. numpy version."""
+    pytest.importorskip('numba')
+    from gpxo._kernels import cum_haversine
+    from gpxo.general import _cumulative_haversine
+    track = gpxo.Track('ExampleTrack.gpx')
+    lat, long = np.radians(track.latitude), np.radians(track.longitude)
+    expected = _cumulative_haversine(np.cos(lat), np.diff(lat), np.diff(long))
+    assert np.allclose(cum_haversine(track.latitude, track.longitude), expected)
+
+
+def test_compass_xy_kernel():
+    """Compiled compass components (used for long tracks) vs. numpy version."""
+    pytest.importorskip('numba')
+    from gpxo._kernels import compass_xy
+    track = gpxo.Track('ExampleTrack.gpx')
+    n = track.latitude.size
+    x, y = np.empty(n - 1), np.empty(n - 1)
+    compass_xy(track.latitude, track.longitude, x, y)
+    x_expected, y_expected = track._compass_xy()  # numpy version (short track)
+    assert np.allclose(x, x_expected) and np.allclose(y, y_expected)
+
+
+def test_cached_properties():
+    """Properties are cached, and updated when basic attributes change."""
+    track = gpxo.Track('ExampleTrack.gpx')
+    assert track.distance is track.distance
+    d = track.distance[-1]
+    seconds = track.seconds
+    track.smooth(n=51)
+    assert track.distance[-1] < d
+    assert track.seconds is seconds  # not affected by smoothing positions
+    d = track.distance[-1]
+    track.latitude[-1] += 0.01  # in-place, not detected without clear_cache()
+    assert track.distance[-1] == d
+    track.clear_cache()
+    assert track.distance[-1] > d
+
+
+def _smooth_reference(x, n, window):
+    """Original smooth() implementation (concatenated ends, np.convolve)."""
+    x_expanded = np.r_[2 * x[0] - x[n:0:-1], x, 2 * x[-1] - x[-2:-n - 2:-1]]
+    w = np.ones(n) if window == 'flat' else getattr(np, window)(n)
+    y = np.convolve(w / w.sum(), x_expanded, mode='valid')
+    istart = int(n / 2) + 1
+    return y[istart:istart + len(x)]
+
+
+def test_smooth():
+    """Smoothing should agree with the original np.convolve implementation."""
+    x = gpxo.Track('ExampleTrack.gpx').elevation
+    n_fft = gpxo.general.FFT_WINDOW_THRESHOLD + 1  # FFT convolution if scipy
+    for window, n in (('hanning', 5), ('blackman', 51), ('hamming', n_fft),
+                      ('flat', 5), ('flat', n_fft)):
+        assert np.allclose(gpxo.smooth(x, n, window), _smooth_reference(x, n, window))
+
+
+def test_smooth_compiled():
+    """Compiled smoothing kernels should agree with the original implementation."""
+    pytest.importorskip('numba')
+    x = gpxo.Track('ExampleTrack.gpx').elevation
+    for window, n in ('hanning', 5), ('bartlett', 21):
+        y = gpxo.smooth(x, n, window, compiled=True)
+        assert np.allclose(y, _smooth_reference(x, n, window))
+
+
+def test_haversine():
+    """Test haversine distance with individual points and arrays."""
+    assert round(haversine((0, 0), (0, 1)), 3) == 111.195
+    assert type(haversine((0, 0), (45, 90))) is float
+    pt1 = ((0, 0), (0, 0))
+    pt2 = ((0, 1), (1, 0))
+    assert all(np.round(haversine(pt1, pt2), 3) == (111.195, 111.195))
+
+
 def test_compass_single():
     """Test compass calculation with individual (lat, long) tuples."""
     assert compass((0, 0), (45, 0)) == 0.0
@@ -37,6 +191,55 @@ def test_compass_multiple():
     assert all(compass(pt1, pt2) == (0, 180, 90, 270))
 
 
+def test_compass_range():
+    """Bearings should be in [0, 360), including tiny negative angles."""
+    assert compass((0, 0), (1, -1e-16)) == 0
+    lat2, long2 = np.ones(3), np.array([-1e-16, 0, -1])
+    bearings = compass((np.zeros(3), np.zeros(3)), (lat2, long2))
+    assert bearings[0] == 0 and np.all((bearings >= 0) & (bearings < 360))
+
+
+def test_compass_kernel():
+    """Compiled compass (used for long arrays) vs. numpy version."""
+    pytest.importorskip('numba')
+    from gpxo._kernels import compass_kernel
+    track = gpxo.Track('ExampleTrack.gpx')
+    lat, long = track.latitude, track.longitude
+    bearings = np.empty(lat.size - 1)
+    compass_kernel(lat[:-1], long[:-1], lat[1:], long[1:], bearings)
+    expected = compass((lat[:-1], long[:-1]), (lat[1:], long[1:]))
+    assert np.allclose(bearings, expected, atol=1e-6)
+
+
+def test_strip_timezone():
+    """Timezone info removed from GPX times (streaming parser)."""
+    from gpxo.track import _strip_timezone
+    for timestr in ('2020-01-01T10:00:00Z', '2020-01-01T10:00:00+02:00',
+                    '2020-01-01T10:00:00-0300', '2020-01-01T10:00:00+02',
+                    '2020-01-01T10:00:00'):
+        assert _strip_timezone(timestr) == '2020-01-01T10:00:00'
+    assert _strip_timezone('2020-01-01T10:00:00.5-03:00') == '2020-01-01T10:00:00.5'
+
+
+def test_utc_offset(tmp_path):
+    """Durations should be correct when UTC offset changes (e.g. DST change)."""
+    from gpxo.track import _utc_offset
+    assert [_utc_offset(f'2020-01-01T10:00:00{tz}') for tz in
+            ('Z', '', '+02:00', '-0330', '+01')] == [0, 0, 7200, -12600, 3600]
+    times = ('2020-03-29T01:59:00+01:00', '2020-03-29T03:00:00+02:00',
+             '2020-03-29T03:01:00+02:00')
+    pts = ''.join(f'<trkpt lat="45.0{i}" lon="5.0"><time>{t}</time></trkpt>'
+                  for i, t in enumerate(times))
+    filename = tmp_path / 'dst.gpx'
+    filename.write_text('<?xml version="1.0"?><gpx version="1.1" '
+                        'xmlns="http://www.topografix.com/GPX/1/1">'
+                        f'<trk><trkseg>{pts}</trkseg></trk></gpx>')
+    for parser in 'gpxpy', 'stream':
+        track = gpxo.Track(str(filename), parser=parser)
+        assert list(track.seconds) == [0, 60, 120]
+        assert str(track.time[1]) == '2020-03-29T03:00:00.000000000'  # local time
+
+
 def test_closest_pt():
     """Test find index of closest point in trajectory to specified pt."""
     lats = [45.011, 45.012, 45.013, 45.014, 45.015, 45.016, 45.017]
@@ -45,3 +248,57 @@ def test_closest_pt():
     pt = (45.0133, 5.888)
     i = closest_pt(pt, traj)
     assert i == 2
+    assert closest_pt(pt, traj, refine=0) == 2
+    # trajectory crossing the antimeridian
+    traj = (np.zeros(5), [179.99, -170, -171, -172, -173])
+    assert closest_pt((0, -179.995), traj) == 0
+    assert closest_pt((0, -179.995), traj, refine=0) == 0
+
+
+def test_closest_pts():
+    """Batch closest point search should agree with individual searches."""
+    track = gpxo.Track('ExampleTrack.gpx')
+    pts = [(45.8425, 4.7990), (45.84, 4.80), (45.85, 4.79)]
+    traj = (track.latitude, track.longitude)
+    expected = [closest_pt(pt, traj) for pt in pts]
+    assert list(closest_pts(pts, traj)) == expected
+    assert list(track.closest_to_many(pts)) == expected
+    assert list(closest_pts(pts, traj, refine=0)) == [closest_pt(pt, traj, refine=0) for pt in pts]
+    # trajectory crossing the antimeridian
+    traj = (np.zeros(5), [179.99, -170, -171, -172, -173])
+    assert list(closest_pts([(0, -179.995), (0, 179.5)], traj)) == [0, 0]
+    assert list(closest_pts([(0, -179.995), (0, -171.2)], traj, refine=0)) == [0, 2]
+
+
+def test_closest_to_index():
+    """Closest point search with and without BallTree index should agree."""
+    pytest.importorskip('sklearn')
+    track = gpxo.Track('ExampleTrack.gpx')
+    pt = (45.8425, 4.7990)
+    i = track.closest_to(pt)
+    track.build_index()
+    assert track.closest_to(pt) == i
+
+
+def test_closest_to_kdtree(monkeypatch):
+    """Closest point search with scipy index (scikit-learn not installed)."""
+    pytest.importorskip('scipy')
+    monkeypatch.setitem(sys.modules, 'sklearn.neighbors', None)
+    track = gpxo.Track('ExampleTrack.gpx')
+    pts = [(45.8425, 4.7990), (45.84, 4.80)]
+    expected = track.closest_to_many(pts)
+    track.build_index()
+    assert list(track.closest_to_many(pts)) == list(expected)
+    assert track.closest_to(pts[0]) == expected[0]
+
+
+def test_decimate():
+    """Points plotted by Track.map() when max_points is set."""
+    from gpxo.track import _decimate
+    for n, max_points in (10, 3), (5120, 1000), (5120, 2), (7, 7), (8, 7), (3, 10):
+        pts = _decimate(n, max_points)
+        assert pts[0] == 0 and pts[-1] == n - 1
+        assert len(pts) <= max_points and len(pts) == len(set(pts))
+        assert np.all(np.diff(pts) > 0)
+    with pytest.raises(ValueError):
+        _decimate(10, 0)